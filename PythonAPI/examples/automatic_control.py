@@ -9,7 +9,6 @@
 """Example of automatic vehicle control from client side, with a python defined agent"""
 
 import argparse
-import collections
 import datetime
 import logging
 import math
@@ -267,6 +266,8 @@ class HUD(object):
         self._show_info = True
         self._info_text = []
         self._server_clock = pygame.time.Clock()
+        self._vehicles = []
+        self._vehicles_time = None
 
     def on_world_tick(self, timestamp):
         """Gets informations from the world at every tick"""
@@ -287,11 +288,10 @@ class HUD(object):
         heading += 'S' if abs(transform.rotation.yaw) > 90.5 else ''
         heading += 'E' if 179.5 > transform.rotation.yaw > 0.5 else ''
         heading += 'W' if -0.5 > transform.rotation.yaw > -179.5 else ''
-        colhist = world.collision_sensor.get_collision_history()
-        collision = [colhist[x + self.frame - 200] for x in range(0, 200)]
-        max_col = max(1.0, max(collision))
-        collision = [x / max_col for x in collision]
-        vehicles = world.world.get_actors().filter('vehicle.*')
+        collision = world.collision_sensor.get_collision_history(self.frame - 200, 200)
+        collision /= max(1.0, collision.max())
+        collision = collision.tolist()
+        vehicles = self._get_vehicles(world.world)
 
         self._info_text = [
             'Server:  % 16.0f FPS' % self.server_fps,
@@ -330,16 +330,29 @@ class HUD(object):
         if len(vehicles) > 1:
             self._info_text += ['Nearby vehicles:']
 
-        def dist(l):
-            return math.sqrt((l.x - transform.location.x)**2 + (l.y - transform.location.y)
-                             ** 2 + (l.z - transform.location.z)**2)
-        vehicles = [(dist(x.get_location()), x) for x in vehicles if x.id != world.player.id]
-
-        for dist, vehicle in sorted(vehicles):
-            if dist > 200.0:
-                break
-            vehicle_type = get_actor_display_name(vehicle, truncate=22)
-            self._info_text.append('% 4dm %s' % (dist, vehicle_type))
+        vehicles = [x for x in vehicles if x.id != world.player.id]
+        locations = np.array([[l.x, l.y, l.z] for l in (x.get_location() for x in vehicles)]).reshape(-1, 3)
+        distances = np.linalg.norm(
+            locations - [transform.location.x, transform.location.y, transform.location.z], axis=1)
+
+        nearby = np.flatnonzero(distances <= 200.0)
+        # render() draws one 18 pixel row per line, so only name the vehicles
+        # that can still fit on the screen
+        rows = max(0, self.dim[1] // 18 - len(self._info_text))
+        for i in nearby[np.argsort(distances[nearby])][:rows]:
+            vehicle_type = get_actor_display_name(vehicles[i], truncate=22)
+            self._info_text.append('% 4dm %s' % (distances[i], vehicle_type))
+
+    def _get_vehicles(self, world):
+        """Returns the vehicles in the world, listing them at most once per simulated second"""
+        # listing the actors goes through the simulator, so between refreshes
+        # only drop the vehicles that were destroyed
+        if self._vehicles_time is None or not 0.0 <= self.simulation_time - self._vehicles_time < 1.0:
+            self._vehicles = list(world.get_actors().filter('vehicle.*'))
+            self._vehicles_time = self.simulation_time
+        else:
+            self._vehicles = [x for x in self._vehicles if x.is_alive]
+        return self._vehicles
 
     def toggle_info(self):
         """Toggle info on or off"""
@@ -481,11 +494,18 @@ class CollisionSensor(object):
         weak_self = weakref.ref(self)
         self.sensor.listen(lambda event: CollisionSensor._on_collision(weak_self, event))
 
-    def get_collision_history(self):
-        """Gets the history of collisions"""
-        history = collections.defaultdict(int)
-        for frame, intensity in self.history:
-            history[frame] += intensity
+    def get_collision_history(self, first_frame, frames):
+        """Gets the intensity of the collisions for each frame starting at first_frame"""
+        # accumulate into one pre-sized array instead of a dict over the whole
+        # history. Events are appended in frame order, so only the tail of the
+        # history needs to be walked
+        history = np.zeros(frames)
+        for frame, intensity in reversed(self.history):
+            index = frame - first_frame
+            if index < 0:
+                break
+            if index < frames:
+                history[index] += intensity
         return history
 
     @staticmethod
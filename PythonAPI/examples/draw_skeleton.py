@@ -9,8 +9,8 @@
 
 import math
 import argparse
-import copy
-from multiprocessing import Pool
+import os
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
 import carla
@@ -32,6 +32,86 @@ except ImportError:
     import Queue as queue
 
 
+# pairs of bones (parent, child) to link when drawing the skeleton
+SKELETON_BONES = [
+    ("crl_hips__C", "crl_spine__C"),
+    ("crl_hips__C", "crl_thigh__R"),
+    ("crl_hips__C", "crl_thigh__L"),
+    ("crl_spine__C", "crl_spine01__C"),
+    ("crl_spine01__C", "crl_shoulder__L"),
+    ("crl_spine01__C", "crl_neck__C"),
+    ("crl_spine01__C", "crl_shoulder__R"),
+    ("crl_shoulder__L", "crl_arm__L"),
+    ("crl_arm__L", "crl_foreArm__L"),
+    ("crl_foreArm__L", "crl_hand__L"),
+    ("crl_hand__L", "crl_handThumb__L"),
+    ("crl_hand__L", "crl_handIndex__L"),
+    ("crl_hand__L", "crl_handMiddle__L"),
+    ("crl_hand__L", "crl_handRing__L"),
+    ("crl_hand__L", "crl_handPinky__L"),
+    ("crl_handThumb__L", "crl_handThumb01__L"),
+    ("crl_handThumb01__L", "crl_handThumb02__L"),
+    ("crl_handThumb02__L", "crl_handThumbEnd__L"),
+    ("crl_handIndex__L", "crl_handIndex01__L"),
+    ("crl_handIndex01__L", "crl_handIndex02__L"),
+    ("crl_handIndex02__L", "crl_handIndexEnd__L"),
+    ("crl_handMiddle__L", "crl_handMiddle01__L"),
+    ("crl_handMiddle01__L", "crl_handMiddle02__L"),
+    ("crl_handMiddle02__L", "crl_handMiddleEnd__L"),
+    ("crl_handRing__L", "crl_handRing01__L"),
+    ("crl_handRing01__L", "crl_handRing02__L"),
+    ("crl_handRing02__L", "crl_handRingEnd__L"),
+    ("crl_handPinky__L", "crl_handPinky01__L"),
+    ("crl_handPinky01__L", "crl_handPinky02__L"),
+    ("crl_handPinky02__L", "crl_handPinkyEnd__L"),
+    ("crl_neck__C", "crl_Head__C"),
+    ("crl_Head__C", "crl_eye__L"),
+    ("crl_Head__C", "crl_eye__R"),
+    ("crl_shoulder__R", "crl_arm__R"),
+    ("crl_arm__R", "crl_foreArm__R"),
+    ("crl_foreArm__R", "crl_hand__R"),
+    ("crl_hand__R", "crl_handThumb__R"),
+    ("crl_hand__R", "crl_handIndex__R"),
+    ("crl_hand__R", "crl_handMiddle__R"),
+    ("crl_hand__R", "crl_handRing__R"),
+    ("crl_hand__R", "crl_handPinky__R"),
+    ("crl_handThumb__R", "crl_handThumb01__R"),
+    ("crl_handThumb01__R", "crl_handThumb02__R"),
+    ("crl_handThumb02__R", "crl_handThumbEnd__R"),
+    ("crl_handIndex__R", "crl_handIndex01__R"),
+    ("crl_handIndex01__R", "crl_handIndex02__R"),
+    ("crl_handIndex02__R", "crl_handIndexEnd__R"),
+    ("crl_handMiddle__R", "crl_handMiddle01__R"),
+    ("crl_handMiddle01__R", "crl_handMiddle02__R"),
+    ("crl_handMiddle02__R", "crl_handMiddleEnd__R"),
+    ("crl_handRing__R", "crl_handRing01__R"),
+    ("crl_handRing01__R", "crl_handRing02__R"),
+    ("crl_handRing02__R", "crl_handRingEnd__R"),
+    ("crl_handPinky__R", "crl_handPinky01__R"),
+    ("crl_handPinky01__R", "crl_handPinky02__R"),
+    ("crl_handPinky02__R", "crl_handPinkyEnd__R"),
+    ("crl_thigh__R", "crl_leg__R"),
+    ("crl_leg__R", "crl_foot__R"),
+    ("crl_foot__R", "crl_toe__R"),
+    ("crl_toe__R", "crl_toeEnd__R"),
+    ("crl_thigh__L", "crl_leg__L"),
+    ("crl_leg__L", "crl_foot__L"),
+    ("crl_foot__L", "crl_toe__L"),
+    ("crl_toe__L", "crl_toeEnd__L"),
+]
+
+# change from UE4's coordinate system to an "standard" one
+# (x, y ,z) -> (y, -z, x)
+# and remove the fourth component also
+UE4_TO_STANDARD = np.array([
+    [0.0, 1.0, 0.0, 0.0],
+    [0.0, 0.0, -1.0, 0.0],
+    [1.0, 0.0, 0.0, 0.0]])
+
+# minimum depth (in meters) of the points drawn in front of the camera
+NEAR_PLANE = 0.1
+
+
 class CarlaSyncMode(object):
     """
     Context manager to synchronize output from different sensors. Synchronous
@@ -91,17 +171,25 @@ def build_projection_matrix(w, h, fov):
     K[1, 2] = h / 2.0
     return K
 
-def get_image_as_array(image):
+def get_image_as_array(image, out=None):
     array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
     array = np.reshape(array, (image.height, image.width, 4))
     array = array[:, :, :3]
     array = array[:, :, ::-1]
-    # make the array writeable doing a deep copy
-    array2 = copy.deepcopy(array)
-    return array2
-
-def draw_image(surface, array, blend=False):
-    image_surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+    if out is not None:
+        # reuse the given buffer, so nothing is allocated per frame
+        np.copyto(out, array)
+        return out
+    # make the array writeable doing a single contiguous copy, so it can also
+    # be handed to pygame as a raw buffer
+    return np.array(array, order='C')
+
+def make_image_surface(array):
+    # wrap the (height, width, 3) buffer directly, no transpose needed. The
+    # surface shares its pixels with the array, so it follows any change to it
+    return pygame.image.frombuffer(array, (array.shape[1], array.shape[0]), 'RGB')
+
+def draw_image(surface, image_surface, blend=False):
     if blend:
         image_surface.set_alpha(100)
     surface.blit(image_surface, (0, 0))
@@ -114,150 +202,94 @@ def get_font():
     font = pygame.font.match_font(font)
     return pygame.font.Font(font, 14)
 
-def get_screen_points(camera, K, image_w, image_h, points3d):
-    
+def get_world_2_camera(transform):
     # get 4x4 matrix to transform points from world to camera coordinates
-    world_2_camera = np.array(camera.get_transform().get_inverse_matrix())
+    return np.array(transform.get_inverse_matrix())
+
+def build_camera_matrix(K):
+    # the change of axes and K are fixed for a camera, so fold them once into a
+    # 3x4 matrix that only needs the world to camera transform of each frame
+    return np.dot(K, UE4_TO_STANDARD)
+
+def get_screen_points(world_2_camera, camera_matrix, points3d):
 
     # build the points array in numpy format as (x, y, z, 1) to be operable with a 4x4 matrix
-    points_temp = []
-    for p in points3d:
-        points_temp += [p.x, p.y, p.z, 1]
-    points = np.array(points_temp).reshape(-1, 4).T
-    
-    # convert world points to camera space
-    points_camera = np.dot(world_2_camera, points)
-    
-    # New we must change from UE4's coordinate system to an "standard"
-    # (x, y ,z) -> (y, -z, x)
-    # and we remove the fourth component also
-    points = np.array([
-        points_camera[1],
-        points_camera[2] * -1,
-        points_camera[0]])
-    
-    # Finally we can use our K matrix to do the actual 3D -> 2D.
-    points_2d = np.dot(K, points)
+    points = np.ones((4, len(points3d)))
+    points[:3] = np.array([[p.x, p.y, p.z] for p in points3d]).T
 
-    # normalize the values and transpose
-    points_2d = np.array([
-        points_2d[0, :] / points_2d[2, :],
-        points_2d[1, :] / points_2d[2, :],
-        points_2d[2, :]]).T
+    # fold the conversion to camera space into the camera matrix, so the
+    # points are converted and projected (3D -> 2D) with one product
+    projection = np.dot(camera_matrix, world_2_camera)
+    points_2d = np.dot(projection, points)
 
+    # transpose, keeping the homogeneous values (u * depth, v * depth, depth)
+    return points_2d.T
+
+def normalize_screen_points(points_2d):
+    # divide by the depth, which is kept as the third component
+    points_2d = np.array(points_2d)
+    points_2d[..., :2] /= points_2d[..., 2:]
     return points_2d
 
+def clip_lines_to_near_plane(lines, near=NEAR_PLANE):
+    # the homogeneous screen points are a linear function of the 3D points,
+    # so a line crossing the near plane can be clipped by interpolating them
+    # before dividing by the depth. Lines fully behind it are dropped
+    lines = lines[(lines[:, :, 2] > near).any(axis=1)]
+    depth_start = lines[:, 0, 2]
+    depth_end = lines[:, 1, 2]
+    behind_start = depth_start <= near
+    behind_end = depth_end <= near
+    crossing = behind_start | behind_end
+    t = (near - depth_start[crossing]) / (depth_end[crossing] - depth_start[crossing])
+    clipped = lines[crossing, 0] + t[:, None] * (lines[crossing, 1] - lines[crossing, 0])
+    lines[behind_start, 0] = clipped[behind_start[crossing]]
+    lines[behind_end, 1] = clipped[behind_end[crossing]]
+    return lines
+
 def draw_points_on_buffer(buffer, image_w, image_h, points_2d, color, size=4):
+    if len(points_2d) == 0:
+        return
     half = int(size / 2)
-    # draw each point
-    for p in points_2d:
-        x = int(p[0])
-        y = int(p[1])
-        for j in range(y - half, y + half):
-            if (j >=0 and j <image_h):
-                for i in range(x - half, x + half):
-                    if (i >=0 and i <image_w):
-                        buffer[j][i][0] = color[0]
-                        buffer[j][i][1] = color[1]
-                        buffer[j][i][2] = color[2]
+    offsets = np.arange(-half, half)
+    # truncate the coordinates the same way int() does
+    points = np.asarray(points_2d)[:, :2].astype(np.int64)
+    # build the square of pixels around each point all at once
+    xs = points[:, 0, None, None] + offsets[None, None, :]
+    ys = points[:, 1, None, None] + offsets[None, :, None]
+    xs, ys = np.broadcast_arrays(xs, ys)
+    # keep only the pixels inside the image
+    inside = (xs >= 0) & (xs < image_w) & (ys >= 0) & (ys < image_h)
+    buffer[ys[inside], xs[inside]] = color
+
+def draw_lines_on_buffer(buffer, image_w, image_h, lines, color, size=4):
+    # truncate the end points the same way int() does
+    ends = np.asarray(lines)[:, :, :2].astype(np.int64).reshape(-1, 2, 2)
+    # one pixel per step along the longest axis of each line, as Bresenham's
+    # algorithm does, laid out one line after the other
+    steps = np.abs(ends[:, 1] - ends[:, 0]).max(axis=1) + 1
+    line = np.repeat(np.arange(len(steps)), steps)
+    step = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = step / np.maximum(steps[line] - 1, 1)
+    points = ends[line, 0] + t[:, None] * (ends[line, 1] - ends[line, 0])
+    # stamp the pixels of all the lines at once
+    draw_points_on_buffer(buffer, image_w, image_h, np.rint(points), color, size)
 
 def draw_line_on_buffer(buffer, image_w, image_h, points_2d, color, size=4):
-  x0 = int(points_2d[0][0])
-  y0 = int(points_2d[0][1])
-  x1 = int(points_2d[1][0])
-  y1 = int(points_2d[1][1])
-  dx = abs(x1 - x0)
-  if x0 < x1:
-    sx = 1
-  else:
-    sx = -1
-  dy = -abs(y1 - y0)
-  if y0 < y1:
-    sy = 1
-  else:
-    sy = -1
-  err = dx + dy
-  while True:
-    draw_points_on_buffer(buffer, image_w, image_h, ((x0,y0),), color, size)
-    if (x0 == x1 and y0 == y1):
-      break
-    e2 = 2 * err
-    if (e2 >= dy):
-      err += dy
-      x0 += sx
-    if (e2 <= dx):
-      err += dx
-      y0 += sy
-
-def draw_skeleton(buffer, image_w, image_h, boneIndex, points2d, color, size=4):
-    try:
-        # draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_root"]], points2d[boneIndex["crl_hips__C"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hips__C"]], points2d[boneIndex["crl_spine__C"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hips__C"]], points2d[boneIndex["crl_thigh__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hips__C"]], points2d[boneIndex["crl_thigh__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_spine__C"]], points2d[boneIndex["crl_spine01__C"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_spine01__C"]], points2d[boneIndex["crl_shoulder__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_spine01__C"]], points2d[boneIndex["crl_neck__C"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_spine01__C"]], points2d[boneIndex["crl_shoulder__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_shoulder__L"]], points2d[boneIndex["crl_arm__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_arm__L"]], points2d[boneIndex["crl_foreArm__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_foreArm__L"]], points2d[boneIndex["crl_hand__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__L"]], points2d[boneIndex["crl_handThumb__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__L"]], points2d[boneIndex["crl_handIndex__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__L"]], points2d[boneIndex["crl_handMiddle__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__L"]], points2d[boneIndex["crl_handRing__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__L"]], points2d[boneIndex["crl_handPinky__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb__L"]], points2d[boneIndex["crl_handThumb01__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb01__L"]], points2d[boneIndex["crl_handThumb02__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb02__L"]], points2d[boneIndex["crl_handThumbEnd__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex__L"]], points2d[boneIndex["crl_handIndex01__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex01__L"]], points2d[boneIndex["crl_handIndex02__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex02__L"]], points2d[boneIndex["crl_handIndexEnd__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle__L"]], points2d[boneIndex["crl_handMiddle01__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle01__L"]], points2d[boneIndex["crl_handMiddle02__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle02__L"]], points2d[boneIndex["crl_handMiddleEnd__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing__L"]], points2d[boneIndex["crl_handRing01__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing01__L"]], points2d[boneIndex["crl_handRing02__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing02__L"]], points2d[boneIndex["crl_handRingEnd__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky__L"]], points2d[boneIndex["crl_handPinky01__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky01__L"]], points2d[boneIndex["crl_handPinky02__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky02__L"]], points2d[boneIndex["crl_handPinkyEnd__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_neck__C"]], points2d[boneIndex["crl_Head__C"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_Head__C"]], points2d[boneIndex["crl_eye__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_Head__C"]], points2d[boneIndex["crl_eye__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_shoulder__R"]], points2d[boneIndex["crl_arm__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_arm__R"]], points2d[boneIndex["crl_foreArm__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_foreArm__R"]], points2d[boneIndex["crl_hand__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__R"]], points2d[boneIndex["crl_handThumb__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__R"]], points2d[boneIndex["crl_handIndex__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__R"]], points2d[boneIndex["crl_handMiddle__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__R"]], points2d[boneIndex["crl_handRing__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_hand__R"]], points2d[boneIndex["crl_handPinky__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb__R"]], points2d[boneIndex["crl_handThumb01__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb01__R"]], points2d[boneIndex["crl_handThumb02__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handThumb02__R"]], points2d[boneIndex["crl_handThumbEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex__R"]], points2d[boneIndex["crl_handIndex01__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex01__R"]], points2d[boneIndex["crl_handIndex02__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handIndex02__R"]], points2d[boneIndex["crl_handIndexEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle__R"]], points2d[boneIndex["crl_handMiddle01__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle01__R"]], points2d[boneIndex["crl_handMiddle02__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handMiddle02__R"]], points2d[boneIndex["crl_handMiddleEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing__R"]], points2d[boneIndex["crl_handRing01__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing01__R"]], points2d[boneIndex["crl_handRing02__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handRing02__R"]], points2d[boneIndex["crl_handRingEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky__R"]], points2d[boneIndex["crl_handPinky01__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky01__R"]], points2d[boneIndex["crl_handPinky02__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_handPinky02__R"]], points2d[boneIndex["crl_handPinkyEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_thigh__R"]], points2d[boneIndex["crl_leg__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_leg__R"]], points2d[boneIndex["crl_foot__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_foot__R"]], points2d[boneIndex["crl_toe__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_toe__R"]], points2d[boneIndex["crl_toeEnd__R"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_thigh__L"]], points2d[boneIndex["crl_leg__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_leg__L"]], points2d[boneIndex["crl_foot__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_foot__L"]], points2d[boneIndex["crl_toe__L"]]), color, size)
-        draw_line_on_buffer(buffer, image_w, image_h, (points2d[boneIndex["crl_toe__L"]], points2d[boneIndex["crl_toeEnd__L"]]), color, size)
-    except:
-        pass
+    draw_lines_on_buffer(buffer, image_w, image_h, [points_2d[:2]], color, size)
+
+def get_bone_pairs(boneIndex):
+    # resolve the bone names of the skeleton into pairs of indices of the points
+    # array, skipping the bones this pedestrian does not have
+    pairs = [(boneIndex[a], boneIndex[b]) for a, b in SKELETON_BONES
+             if a in boneIndex and b in boneIndex]
+    return np.array(pairs, dtype=np.int32).reshape(-1, 2)
+
+def draw_skeleton(buffer, image_w, image_h, bone_pairs, points2d, color, size=4):
+    # gather both end points of every bone at once, and cut the bones at the
+    # near plane so the part behind the camera is not drawn
+    lines = clip_lines_to_near_plane(points2d[bone_pairs])
+    draw_lines_on_buffer(buffer, image_w, image_h, normalize_screen_points(lines), color, size)
 
 def should_quit():
     for event in pygame.event.get():
@@ -281,6 +313,9 @@ def main():
     argparser.add_argument(
       '--res', metavar='WIDTHxHEIGHT', default='800x600',
       help='window resolution (default: 800x600)')
+    argparser.add_argument(
+        '--save', action='store_true',
+        help='save the frames with the skeleton to _out/ (default: False)')
     args = argparser.parse_args()
     
     args.width, args.height = [int(x) for x in args.res.split('x')]
@@ -329,16 +364,28 @@ def main():
     image_h = camera_bp.get_attribute("image_size_y").as_int()
     fov = camera_bp.get_attribute("fov").as_float()
 
+    # write the frames in the background, so the main loop does not wait for
+    # the PNG encoding and the disk
+    executor = None
+    if args.save:
+        os.makedirs('_out', exist_ok=True)
+        executor = ThreadPoolExecutor(max_workers=2)
+
     try:
-        pool = Pool(processes=5)
         # Create a synchronous mode context.
         with CarlaSyncMode(world, camera, fps=30) as sync_mode:
             
             # set the projection matrix
             K = build_projection_matrix(image_w, image_h, fov)
+            camera_matrix = build_camera_matrix(K)
+
+            # image buffer and the surface showing it, reused every frame
+            buffer = np.empty((image_h, image_w, 3), dtype=np.uint8)
+            image_surface = make_image_surface(buffer)
 
             blending = 0
             turning = 0
+            bone_pairs = None
             while True:
                 if should_quit():
                     return
@@ -367,29 +414,37 @@ def main():
                 snapshot, image_rgb = sync_mode.tick(timeout=5.0)
 
                 # Draw the display.
-                buffer = get_image_as_array(image_rgb)
+                get_image_as_array(image_rgb, buffer)
 
                 # get the pedestrian bones
                 bones = ped.get_bones()
                 
-                # prepare the bones (get name and world position)
-                boneIndex = {}  
-                points = []
-                for i, bone in enumerate(bones.bone_transforms):
-                    boneIndex[bone.name] = i
-                    points.append(bone.world.location)
+                # the bone names do not change between frames, so resolve the
+                # skeleton links only once
+                if bone_pairs is None:
+                    boneIndex = {bone.name: i for i, bone in enumerate(bones.bone_transforms)}
+                    bone_pairs = get_bone_pairs(boneIndex)
+
+                # prepare the bones (get world position)
+                points = [bone.world.location for bone in bones.bone_transforms]
                 
-                # project the 3d points to 2d screen
-                points2d = get_screen_points(camera, K, image_w, image_h, points)
+                # project the 3d points to 2d screen, using the transform the
+                # camera had when the image was captured
+                world_2_camera = get_world_2_camera(image_rgb.transform)
+                points2d = get_screen_points(world_2_camera, camera_matrix, points)
 
                 # draw the skeleton lines
-                draw_skeleton(buffer, image_w, image_h, boneIndex, points2d, (0, 255, 0), 2)
+                draw_skeleton(buffer, image_w, image_h, bone_pairs, points2d, (0, 255, 0), 2)
 
-                # draw the bone points
-                draw_points_on_buffer(buffer, image_w, image_h, points2d[1:], (255, 0, 0), 4)
+                # draw the bone points that are in front of the camera
+                bone_points = points2d[1:]
+                bone_points = normalize_screen_points(bone_points[bone_points[:, 2] > NEAR_PLANE])
+                draw_points_on_buffer(buffer, image_w, image_h, bone_points, (255, 0, 0), 4)
 
-                draw_image(display, buffer)
-                # pool.apply_async(write_image, (snapshot.frame, "ped", buffer))
+                draw_image(display, image_surface)
+                if executor is not None:
+                    # hand a copy to the writer, the buffer is reused next frame
+                    executor.submit(write_image, snapshot.frame, "ped", buffer.copy())
 
                 # display.blit(font.render('%d bones' % len(points), True, (255, 255, 255)), (8, 10))
 
@@ -401,7 +456,8 @@ def main():
         for actor in actor_list:
             actor.destroy()
         pygame.quit()
-        pool.close()
+        if executor is not None:
+            executor.shutdown()
         print('done.')
 
 
@@ -62,7 +62,6 @@ import carla
 from carla import ColorConverter as cc
 
 import argparse
-import collections
 import datetime
 import logging
 import math
@@ -121,7 +120,7 @@ try:
 except ImportError:
     raise RuntimeError('cannot import numpy, make sure numpy package is installed')
 
-OBJECT_TO_COLOR = [
+OBJECT_TO_COLOR = np.array([
     (255, 255, 255),
     (128, 64, 128),
     (244, 35, 232),
@@ -151,7 +150,7 @@ OBJECT_TO_COLOR = [
     (150, 100, 100),
     (230, 150, 140),
     (180, 165, 180),
-]
+], dtype=np.uint8)
 
 # ==============================================================================
 # -- Global functions ----------------------------------------------------------
@@ -693,6 +692,8 @@ class HUD(object):
         self._show_info = True
         self._info_text = []
         self._server_clock = pygame.time.Clock()
+        self._vehicles = []
+        self._vehicles_time = None
 
         self._show_ackermann_info = False
         self._ackermann_control = carla.VehicleAckermannControl()
@@ -715,11 +716,10 @@ class HUD(object):
         heading += 'S' if 90.5 < compass < 269.5 else ''
         heading += 'E' if 0.5 < compass < 179.5 else ''
         heading += 'W' if 180.5 < compass < 359.5 else ''
-        colhist = world.collision_sensor.get_collision_history()
-        collision = [colhist[x + self.frame - 200] for x in range(0, 200)]
-        max_col = max(1.0, max(collision))
-        collision = [x / max_col for x in collision]
-        vehicles = world.world.get_actors().filter('vehicle.*')
+        collision = world.collision_sensor.get_collision_history(self.frame - 200, 200)
+        collision /= max(1.0, collision.max())
+        collision = collision.tolist()
+        vehicles = self._get_vehicles(world.world)
         self._info_text = [
             'Server:  % 16.0f FPS' % self.server_fps,
             'Client:  % 16.0f FPS' % clock.get_fps(),
@@ -763,13 +763,26 @@ class HUD(object):
             'Number of vehicles: % 8d' % len(vehicles)]
         if len(vehicles) > 1:
             self._info_text += ['Nearby vehicles:']
-            distance = lambda l: math.sqrt((l.x - t.location.x)**2 + (l.y - t.location.y)**2 + (l.z - t.location.z)**2)
-            vehicles = [(distance(x.get_location()), x) for x in vehicles if x.id != world.player.id]
-            for d, vehicle in sorted(vehicles, key=lambda vehicles: vehicles[0]):
-                if d > 200.0:
-                    break
-                vehicle_type = get_actor_display_name(vehicle, truncate=22)
-                self._info_text.append('% 4dm %s' % (d, vehicle_type))
+            vehicles = [x for x in vehicles if x.id != world.player.id]
+            locations = np.array([[l.x, l.y, l.z] for l in (x.get_location() for x in vehicles)]).reshape(-1, 3)
+            distances = np.linalg.norm(locations - [t.location.x, t.location.y, t.location.z], axis=1)
+            nearby = np.flatnonzero(distances <= 200.0)
+            # render() draws one 18 pixel row per line, so only name the vehicles
+            # that can still fit on the screen
+            rows = max(0, self.dim[1] // 18 - len(self._info_text))
+            for i in nearby[np.argsort(distances[nearby])][:rows]:
+                vehicle_type = get_actor_display_name(vehicles[i], truncate=22)
+                self._info_text.append('% 4dm %s' % (distances[i], vehicle_type))
+
+    def _get_vehicles(self, world):
+        # listing the actors goes through the simulator, so do it at most once
+        # per simulated second and in between only drop the destroyed vehicles
+        if self._vehicles_time is None or not 0.0 <= self.simulation_time - self._vehicles_time < 1.0:
+            self._vehicles = list(world.get_actors().filter('vehicle.*'))
+            self._vehicles_time = self.simulation_time
+        else:
+            self._vehicles = [x for x in self._vehicles if x.is_alive]
+        return self._vehicles
 
     def show_ackermann_info(self, enabled):
         self._show_ackermann_info = enabled
@@ -903,10 +916,17 @@ class CollisionSensor(object):
         weak_self = weakref.ref(self)
         self.sensor.listen(lambda event: CollisionSensor._on_collision(weak_self, event))
 
-    def get_collision_history(self):
-        history = collections.defaultdict(int)
-        for frame, intensity in self.history:
-            history[frame] += intensity
+    def get_collision_history(self, first_frame, frames):
+        # accumulate into one pre-sized array instead of a dict over the whole
+        # history. Events are appended in frame order, so only the tail of the
+        # history needs to be walked
+        history = np.zeros(frames)
+        for frame, intensity in reversed(self.history):
+            index = frame - first_frame
+            if index < 0:
+                break
+            if index < frames:
+                history[index] += intensity
         return history
 
     @staticmethod
@@ -1223,19 +1243,18 @@ class CameraManager(object):
             lidar_img[tuple(lidar_data.T)] = (255, 255, 255)
             self.surface = pygame.surfarray.make_surface(lidar_img)
         elif self.sensors[self.index][0] == 'sensor.lidar.ray_cast_semantic':
-            points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-            points = np.reshape(points, (int(points.shape[0] / 6), 6))
-            lidar_data = np.array(points[:, :2])
+            # read the detections in place, the object tag being a uint32 field
+            data = np.frombuffer(image.raw_data, dtype=np.dtype([
+                ('x', np.float32), ('y', np.float32), ('z', np.float32),
+                ('CosAngle', np.float32), ('ObjIdx', np.uint32), ('ObjTag', np.uint32)]))
+            lidar_data = np.array([data['x'], data['y']]).T
             lidar_data *= min(self.hud.dim) / (2.0 * self.lidar_range)
             lidar_data += (0.5 * self.hud.dim[0], 0.5 * self.hud.dim[1])
             lidar_data = lidar_data.astype(np.int32)
             lidar_data = np.reshape(lidar_data, (-1, 2))
             lidar_img_size = (self.hud.dim[0], self.hud.dim[1], 3)
             lidar_img = np.zeros((lidar_img_size), dtype=np.uint8)
-            for i in range(len(image)):
-                point = lidar_data[i]
-                lidar_tag = image[i].object_tag
-                lidar_img[tuple(point.T)] = OBJECT_TO_COLOR[int(lidar_tag)]
+            lidar_img[tuple(lidar_data.T)] = OBJECT_TO_COLOR[data['ObjTag']]
             self.surface = pygame.surfarray.make_surface(lidar_img)
         elif self.sensors[self.index][0].startswith('sensor.camera.optical_flow'):
             image = image.get_color_coded_flow()
@@ -51,7 +51,7 @@ LABEL_COLORS = np.array([
 def lidar_callback(point_cloud, point_list):
     """Prepares a point cloud with intensity
     colors ready to be consumed by Open3D"""
-    data = np.copy(np.frombuffer(point_cloud.raw_data, dtype=np.dtype('f4')))
+    data = np.frombuffer(point_cloud.raw_data, dtype=np.dtype('f4'))
     data = np.reshape(data, (int(data.shape[0] / 4), 4))
 
     # Isolate the intensity and compute a color for it
@@ -62,8 +62,9 @@ def lidar_callback(point_cloud, point_list):
         np.interp(intensity_col, VID_RANGE, VIRIDIS[:, 1]),
         np.interp(intensity_col, VID_RANGE, VIRIDIS[:, 2])]
 
-    # Isolate the 3D data
-    points = data[:, :-1]
+    # Isolate the 3D data, copying only this slice since it is modified
+    # below and the raw buffer is read-only
+    points = np.array(data[:, :-1])
 
     # We're negating the y to correclty visualize a world that matches
     # what we see in Unreal since Open3D uses a right-handed coordinate system
@@ -93,9 +94,9 @@ def semantic_lidar_callback(point_cloud, point_list):
     # # An example of adding some noise to our data if needed:
     # points += np.random.uniform(-0.05, 0.05, size=points.shape)
 
-    # Colorize the pointcloud based on the CityScapes color palette
-    labels = np.array(data['ObjTag'])
-    int_color = LABEL_COLORS[labels]
+    # Colorize the pointcloud based on the CityScapes color palette, indexing
+    # it straight with the uint32 tags of the buffer, without copying them
+    int_color = LABEL_COLORS[data['ObjTag']]
 
     # # In case you want to make the color intensity depending
     # # of the incident ray angle, you can use: